@@ -189,14 +189,22 @@ def test_update_images(admin_session, harvester_api_endpoints, image):
     Covers:
         images-3-Edit Image and images-4-Add Labels
     """
-    image['metadata']['labels'] = {
+    # NOTE: the image fixture is shared by the whole session, so update a
+    # freshly fetched copy instead. This also picks up the latest
+    # resourceVersion, which may have changed since the image was imported.
+    resp = admin_session.get(harvester_api_endpoints.get_image % (
+        image['metadata']['name']))
+    assert resp.status_code == 200, 'Failed to lookup image %s: %s' % (
+        image['metadata']['name'], resp.content)
+    image_json = resp.json()
+    image_json['metadata']['labels'] = {
         'test.harvesterhci.io': 'for-test-update'
     }
-    image['metadata']['annotations'] = {
+    image_json['metadata']['annotations'] = {
         'test.harvesterhci.io': 'for-test-update'
     }
     resp = admin_session.put(harvester_api_endpoints.update_image % (
-        image['metadata']['name']), json=image)
+        image_json['metadata']['name']), json=image_json)
     assert resp.status_code == 200, 'Failed to update image: %s' % (
         resp.content)
     update_image_data = resp.json()
@@ -15,6 +15,7 @@
 # To contact SUSE about this file by physical or electronic mail,
 # you may find current contact information at www.suse.com
 
+from harvester_e2e_tests import utils
 import yaml
 import pytest
 
@@ -66,7 +67,8 @@ def test_create_keypair_by_yaml(admin_session, harvester_api_endpoints,
                                 keypair_request_json):
     resp = admin_session.post(
         harvester_api_endpoints.create_keypair,
-        data=yaml.dump(keypair_request_json[0], sort_keys=False),
+        data=yaml.dump(keypair_request_json[0], Dumper=utils.YAMLDumper,
+                       sort_keys=False),
         headers={'Content-Type': 'application/yaml'})
     assert resp.status_code == 201, 'Failed to create keypair: %s' % (
         resp.content)
@@ -87,7 +87,9 @@ def test_create_volume_by_yaml(request, admin_session,
     """
     request_json = utils.get_json_object_from_template('basic_volume')
     resp = admin_session.post(harvester_api_endpoints.create_volume,
-                              data=yaml.dump(request_json, sort_keys=False),
+                              data=yaml.dump(request_json,
+                                             Dumper=utils.YAMLDumper,
+                                             sort_keys=False),
                               headers={'Content-Type': 'application/yaml'})
     assert resp.status_code == 201, (
         'Failed to create volume with YAML request: %s' % (resp.content))
@@ -117,7 +119,9 @@ def test_create_volume_using_image_by_yaml(request, admin_session,
     request_json['metadata']['annotations'][
         'harvesterhci.io/imageId'] = imageid
     resp = admin_session.post(harvester_api_endpoints.create_volume,
-                              data=yaml.dump(request_json, sort_keys=False),
+                              data=yaml.dump(request_json,
+                                             Dumper=utils.YAMLDumper,
+                                             sort_keys=False),
                               headers={'Content-Type': 'application/yaml'})
     assert resp.status_code == 201, (
         'Failed to create volume with YAML request: %s' % (resp.content))
@@ -93,7 +93,12 @@ def opensuse_image(request, harvester_api_version, admin_session,
                            image_json)
 
 
-@pytest.fixture(scope='class')
+# NOTE: images are immutable once imported, so share the image across test
+# classes instead of importing it again for each one. pytest only caches a
+# single instance of this fixture though: whenever a test requests a
+# different parameter (URL), the current image is torn down and the new
+# one imported, so the default image may be imported more than once.
+@pytest.fixture(scope='session')
 def image(request, admin_session, harvester_api_endpoints):
     cache_url = request.config.getoption('--image-cache-url')
 
@@ -204,9 +204,8 @@ def vms_with_same_vlan(request, admin_session, image, keypair,
                                    user_data=user_data_with_guest_agent))
     yield vms
     if not request.config.getoption('--do-not-cleanup'):
-        for vm_json in vms:
-            utils.delete_vm(request, admin_session, harvester_api_endpoints,
-                            vm_json)
+        utils.delete_vms(request, admin_session, harvester_api_endpoints,
+                         vms)
 
 
 @pytest.fixture(scope='class')
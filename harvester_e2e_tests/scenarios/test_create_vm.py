@@ -73,9 +73,8 @@ def multiple_vms(request, admin_session, ubuntu_image, k3os_image,
                                    harvester_api_endpoints, keypair=keypair))
     yield vms
     if not request.config.getoption('--do-not-cleanup'):
-        for vm_json in vms:
-            utils.delete_vm(request, admin_session, harvester_api_endpoints,
-                            vm_json)
+        utils.delete_vms(request, admin_session, harvester_api_endpoints,
+                         vms)
 
 
 @pytest.mark.parametrize(
@@ -359,12 +358,13 @@ def test_create_update_vm_enable_user_data(request, admin_session, image,
         if 'cloudInitNoCloud' in volume:
             cloudinit = volume
             break
-    user_data = yaml.safe_load(cloudinit['cloudInitNoCloud']['userData']
-                               .replace('\\n', '\n'))
+    user_data = yaml.load(cloudinit['cloudInitNoCloud']['userData']
+                          .replace('\\n', '\n'), Loader=utils.YAMLLoader)
     assert 'packages' not in user_data
     user_data.update(package_data)
     cloudinit['cloudInitNoCloud']['userData'] = yaml.dump(
                                                 user_data,
+                                                Dumper=utils.YAMLDumper,
                                                 default_flow_style=False)
     resp = utils.poll_for_update_resource(
         request, admin_session,
@@ -384,8 +384,9 @@ def test_create_update_vm_enable_user_data(request, admin_session, image,
         if 'cloudInitNoCloud' in volume:
             cloudinit = volume
             break
-    upd_user_data = yaml.safe_load(cloudinit['cloudInitNoCloud']['userData']
-                                   .replace('\\n', '\n'))
+    upd_user_data = yaml.load(cloudinit['cloudInitNoCloud']['userData']
+                              .replace('\\n', '\n'),
+                              Loader=utils.YAMLLoader)
     assert 'packages' in upd_user_data
     assert 'runcmd' in upd_user_data
     assert 'qemu-guest-agent' in upd_user_data['packages']
@@ -412,8 +413,6 @@ def test_create_update_vm_machine_type(request, admin_session, image, keypair,
                                   harvester_api_endpoints, keypair=keypair,
                                   machine_type='pc')
         created = True
-        resp = admin_session.get(harvester_api_endpoints.get_vm_instance % (
-            vm_json['metadata']['name']))
         machine = vm_json['spec']['template']['spec']['domain']['machine']
         assert machine['type'] == 'pc'
         vm_name = vm_json['metadata']['name']
@@ -686,11 +685,9 @@ def test_host_maintenance_mode(request, admin_session, image, keypair,
         host_json = resp.json()
         utils.enable_maintenance_mode(request, admin_session,
                                       harvester_api_endpoints, host_json)
-        utils.poll_for_resource_ready(request, admin_session,
-                                      harvester_api_endpoints.get_node % (
-                                          vm_node_before_migrate))
-        resp = admin_session.get(harvester_api_endpoints.get_node % (
-            vm_node_before_migrate))
+        resp = utils.poll_for_resource_ready(
+            request, admin_session,
+            harvester_api_endpoints.get_node % (vm_node_before_migrate))
         resp.status_code == 200, 'Failed to get host: %s' % (resp.content)
         hdata = resp.json()
         assert hdata["spec"]["unschedulable"]
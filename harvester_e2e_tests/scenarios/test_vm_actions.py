@@ -47,9 +47,6 @@ def backup_restore_migrated_vm(request, admin_session,
             admin_session, harvester_api_endpoints, vm_with_volume)
         vm_node_before_migrate = vm_instance_json['status']['nodeName']
 
-        resp = admin_session.get(harvester_api_endpoints.get_node % (
-            vm_node_before_migrate))
-
         resp = admin_session.get(harvester_api_endpoints.list_nodes)
         assert resp.status_code == 200, 'Failed to list nodes: %s' % (
             resp.content)
@@ -57,6 +54,7 @@ def backup_restore_migrated_vm(request, admin_session,
         for node in nodes_json:
             if node['metadata']['name'] != vm_node_before_migrate:
                 node_to_migrate = node['metadata']['name']
+                break
 
         resp = admin_session.put(harvester_api_endpoints.migrate_vm % (
             vm_name),
@@ -201,7 +199,9 @@ class TestVMActions:
     def test_restart_vm(self, request, admin_session, harvester_api_endpoints,
                         basic_vm):
         vm_name = basic_vm['metadata']['name']
-        previous_uid = basic_vm['metadata']['uid']
+        vm_instance_json = utils.lookup_vm_instance(
+            admin_session, harvester_api_endpoints, basic_vm)
+        previous_uid = vm_instance_json['metadata']['uid']
         utils.restart_vm(admin_session, harvester_api_endpoints, previous_uid,
                          vm_name, request.config.getoption('--wait-timeout'))
 
@@ -220,9 +220,6 @@ class TestVMActions:
             'Failed to start VM instance %s: %s' % (
                 basic_vm['metadata']['name'], resp.content))
 
-        # give it some time for the VM to start
-        time.sleep(120)
-
         def _check_vm_instance_started():
             resp = admin_session.get(
                 harvester_api_endpoints.get_vm_instance % (
@@ -230,13 +227,15 @@ class TestVMActions:
             if resp.status_code == 200:
                 resp_json = resp.json()
                 if ('status' in resp_json and
+                        'phase' in resp_json['status'] and
                         resp_json['status']['phase'] == 'Running'):
                     return True
             return False
 
         success = polling2.poll(
             _check_vm_instance_started,
-            step=5,
+            step=1,
+            step_function=utils.step_backoff,
             timeout=request.config.getoption('--wait-timeout'))
         assert success, 'Failed to get VM instance for: %s' % (
             basic_vm['metadata']['name'])
@@ -248,9 +247,6 @@ class TestVMActions:
         assert resp.status_code == 200, 'Failed to pause VM instance %s' % (
             basic_vm['metadata']['name'])
 
-        # give it some time for the VM to pause
-        time.sleep(60)
-
         def _check_vm_instance_paused():
             resp = admin_session.get(harvester_api_endpoints.get_vm % (
                 basic_vm['metadata']['name']))
@@ -265,7 +261,8 @@ class TestVMActions:
 
         success = polling2.poll(
             _check_vm_instance_paused,
-            step=5,
+            step=1,
+            step_function=utils.step_backoff,
             timeout=request.config.getoption('--wait-timeout'))
         assert success, 'Timed out while waiting for VM to be paused.'
 
@@ -293,7 +290,8 @@ class TestVMActions:
 
         success = polling2.poll(
             _check_vm_instance_unpaused,
-            step=5,
+            step=1,
+            step_function=utils.step_backoff,
             timeout=request.config.getoption('--wait-timeout'))
         assert success, 'Timed out while waiting for VM to be unpaused.'
 
@@ -339,14 +337,12 @@ class TestVMVolumes:
         utils.lookup_vm_instance(
             admin_session, harvester_api_endpoints, vm_with_volume)
         # make sure it's data volumes are in-use
-        volumes = vm_with_volume['spec']['template']['spec']['volumes']
-        for volume in volumes:
+        for volume_name in utils.get_vm_volume_names(vm_with_volume):
             resp = admin_session.get(harvester_api_endpoints.get_volume % (
-                volume['persistentVolumeClaim']['claimName']))
+                volume_name))
             assert resp.status_code == 200, (
                 'Failed to lookup volume %s: %s' % (
-                    volume['persistentVolumeClaim']['claimName'],
-                    resp.content))
+                    volume_name, resp.content))
             volume_json = resp.json()
             owned_by = json.loads(
                 volume_json['metadata']['annotations'].get(
@@ -362,7 +358,7 @@ class TestVMVolumes:
                     found = True
                     break
             assert found, ('Expecting %s to be in volume %s owners list' % (
-                expected_owner, volume['persistentVolumeClaim']['claimName']))
+                expected_owner, volume_name))
 
     def test_delete_volume_in_use(self, request, admin_session,
                                   harvester_api_endpoints, vm_with_volume):
@@ -372,13 +368,11 @@ class TestVMVolumes:
             Negative vol-01-Delete Volume that is in use
             vol-13-Validate volume shows as in use when attached
         """
-        volumes = vm_with_volume['spec']['template']['spec']['volumes']
-        for volume in volumes:
+        for volume_name in utils.get_vm_volume_names(vm_with_volume):
             # try to delete a volume in 'in-use' state and it should
             # fail
             resp = admin_session.delete(
-                harvester_api_endpoints.delete_volume % (
-                    volume['persistentVolumeClaim']['claimName']))
+                harvester_api_endpoints.delete_volume % (volume_name))
             assert resp.status_code not in [200, 201], (
                 'Deleting "in-use" volumes should not be permitted: %s' % (
                     resp.content))
@@ -394,17 +388,16 @@ class TestVMVolumes:
         # delete the VM but keep the volumes
         utils.delete_vm(request, admin_session, harvester_api_endpoints,
                         vm_with_volume, remove_all_disks=False)
-        volumes = vm_with_volume['spec']['template']['spec']['volumes']
-        for data_vol in volumes:
-            volume_name = data_vol['persistentVolumeClaim']['claimName']
+        volume_names = utils.get_vm_volume_names(vm_with_volume)
+        for volume_name in volume_names:
             resp = admin_session.get(harvester_api_endpoints.get_volume % (
                 volume_name))
             assert resp.status_code == 200, (
                 'Failed to lookup data volume %s: %s' % (
                     volume_name, resp.content))
-            # now cleanup the volume
-            utils.delete_volume_by_name(request, admin_session,
-                                        harvester_api_endpoints, volume_name)
+        # now cleanup the volumes
+        utils.delete_volumes_by_name(request, admin_session,
+                                     harvester_api_endpoints, volume_names)
 
 
 @pytest.mark.skip("https://github.com/harvester/harvester/issues/1339")
@@ -111,7 +111,7 @@ class TestHostDown:
                           node_name)
         # VM restarted
         vm_name = basic_vm['metadata']['name']
-        previous_uid = basic_vm['metadata']['uid']
+        previous_uid = vm_instance_json['metadata']['uid']
         utils.assert_vm_restarted(admin_session, harvester_api_endpoints,
                                   previous_uid, vm_name,
                                   request.config.getoption('--wait-timeout'))
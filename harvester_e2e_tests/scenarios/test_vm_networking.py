@@ -31,7 +31,8 @@ pytest_plugins = [
 def restart_vm(request, admin_session, harvester_api_endpoints, vm_json):
     timeout = request.config.getoption('--wait-timeout')
     vm_name = vm_json['metadata']['name']
-    previous_uid = vm_json['metadata']['uid']
+    previous_uid = utils.lookup_vm_instance(
+        admin_session, harvester_api_endpoints, vm_json)['metadata']['uid']
     utils.restart_vm(admin_session, harvester_api_endpoints, previous_uid,
                      vm_name, timeout)
 
@@ -65,13 +66,13 @@ def fileactions_into_vm(ip, timeout, keypair=None,
         for line in stdout.readlines():
             filesPresent.append(line.strip())
     if chkmd5:
-        stdin, stdout, stderr = client.exec_command('ls *.md5 2> /dev/null')
+        # verify all the checksum files over a single channel and only
+        # print back the ones that pass
+        stdin, stdout, stderr = client.exec_command(
+            'for f in *.md5; do [ -e "$f" ] && '
+            'md5sum --status -c "$f" && echo "$f"; done')
         for line in stdout.readlines():
-            stdin, stdout, stderr = client.exec_command(
-                'md5sum --status -c {0} && echo PASS'.format(line.strip()))
-            out = stdout.read().strip()
-            if out.decode('utf-8') == 'PASS':
-                md5pass.append(line.strip())
+            md5pass.append(line.strip())
     client.close()
     err = stderr.read()
     assert len(err) == 0, ('Error while SSH into %s: %s' % (ip, err))
@@ -205,13 +206,12 @@ def backup_restore_chained_backups(request, admin_session,
             vms_with_vlan_as_default_network, timeout)
         script = utils.get_backup_create_files_script(
             request, 'createFiles.sh', 'backup')
-        # scp createFiles script on VM
-        fileactions_into_vm(public_ip, timeout,
-                            script=script)
         for x in range(1, 4):
-            # Create a file in VM
+            # Create a file in VM, copying the createFiles script over the
+            # same SSH connection on the first pass
             fileactions_into_vm(public_ip, timeout,
-                                createfile=x)
+                                createfile=x,
+                                script=script if x == 1 else None)
             time.sleep(70)
             backup_name = "bk" + str(x) + "-" + utils.random_name()
             backup_json = utils.create_vm_backup(request, admin_session,
@@ -340,9 +340,9 @@ class TestVMNetworking:
                 vm_name, resp.status_code, resp.content))
         vm_with_one_vlan = resp.json()
 
-        previous_uid = vm_with_one_vlan['metadata']['uid']
         (vm_instance_json, public_ip) = get_vm_public_ip(
             admin_session, harvester_api_endpoints, vm_with_one_vlan, timeout)
+        previous_uid = vm_instance_json['metadata']['uid']
         # make sure the public_ip is pingable
         assert subprocess.call(['ping', '-c', '3', public_ip]) == 0, (
             'Failed to ping VM %s public IP %s' % (vm_name, public_ip))
@@ -368,7 +368,9 @@ class TestVMNetworking:
             network-13-Add VLAN network
         """
         vm_name = basic_vm['metadata']['name']
-        previous_uid = basic_vm['metadata']['uid']
+        vm_instance_json = utils.lookup_vm_instance(
+            admin_session, harvester_api_endpoints, basic_vm)
+        previous_uid = vm_instance_json['metadata']['uid']
         timeout = request.config.getoption('--wait-timeout')
         # add a new network to the VM
         network_name = 'nic-1'
@@ -434,11 +436,11 @@ class TestVMNetworking:
             Delete external VLAN
         """
         vm_name = vm_with_one_vlan['metadata']['name']
-        previous_uid = vm_with_one_vlan['metadata']['uid']
         timeout = request.config.getoption('--wait-timeout')
         # wait for the VM to boot with a public IP
         (vm_instance_json, public_ip) = get_vm_public_ip(
             admin_session, harvester_api_endpoints, vm_with_one_vlan, timeout)
+        previous_uid = vm_instance_json['metadata']['uid']
         # now remove the second (public IP) NIC from the VM and reboot
         spec = vm_with_one_vlan['spec']['template']['spec']
         interfaces = spec['domain']['devices']['interfaces']
@@ -503,7 +505,8 @@ def test_update_vm_management_network_to_vlan(request, admin_session,
         network-04-Change management network to external VLAN
     """
     vm_name = basic_vm['metadata']['name']
-    previous_uid = basic_vm['metadata']['uid']
+    previous_uid = utils.lookup_vm_instance(
+        admin_session, harvester_api_endpoints, basic_vm)['metadata']['uid']
     timeout = request.config.getoption('--wait-timeout')
     # update VM to use VLAN as it's default network
     basic_vm['spec']['template']['spec']['domain']['devices']['interfaces'] = [
@@ -554,7 +557,9 @@ def test_update_vm_vlan_network_to_management(request, admin_session,
         network-06-Change external VLAN to management network
     """
     vm_name = vms_with_vlan_as_default_network['metadata']['name']
-    previous_uid = vms_with_vlan_as_default_network['metadata']['uid']
+    previous_uid = utils.lookup_vm_instance(
+        admin_session, harvester_api_endpoints,
+        vms_with_vlan_as_default_network)['metadata']['uid']
     timeout = request.config.getoption('--wait-timeout')
     # make sure it has only the public IP
     spec = vms_with_vlan_as_default_network['spec']['template']['spec']
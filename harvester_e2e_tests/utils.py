@@ -15,12 +15,14 @@
 # To contact SUSE about this file by physical or electronic mail,
 # you may find current contact information at www.suse.com
 
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from paramiko import SSHClient, AutoAddPolicy, RSAKey
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from scp import SCPClient
 import boto3
+import functools
 import jinja2
 import json
 import math
@@ -29,6 +31,7 @@ import polling2
 import random
 import requests
 import shutil
+import socket
 import string
 import subprocess
 import tempfile
@@ -36,6 +39,23 @@ import time
 import uuid
 import yaml
 
+try:
+    # use the libyaml bindings when PyYAML is built with them
+    from yaml import CSafeLoader as YAMLLoader  # noqa: F401
+    from yaml import CSafeDumper as YAMLDumper
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader  # noqa: F401
+    from yaml import SafeDumper as YAMLDumper
+
+
+# NOTE: the templates directory must be at the same level as utils.py
+TEMPLATES_PATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'templates')
+
+# NOTE: the session keeps this many connections per host, so do not make
+# more concurrent requests than that
+MAX_CONCURRENT_REQUESTS = 10
+
 
 def retry_session():
     """Create a session that will retry on connection errors"""
@@ -48,7 +68,8 @@ def retry_session():
     retry_strategy = Retry(total=5, backoff_factor=10.0,
                            status_forcelist=[500],
                            allowed_methods=allowed_methods)
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy,
+                          pool_maxsize=MAX_CONCURRENT_REQUESTS)
     s = requests.Session()
     # TODO(gyee): do we need to support other auth methods?
     # NOTE(gyee): ignore SSL certificate validation for now
@@ -58,6 +79,15 @@ def retry_session():
     return s
 
 
+def step_backoff(step):
+    """Step function for polling2 that backs off up to 5 seconds
+
+    Start polling with a small step so fast state transitions are picked up
+    right away, then grow the interval for the slower ones.
+    """
+    return min(step * 1.5, 5)
+
+
 def random_name():
     """Generate a random alphanumeric name using uuid.uuid4()"""
     return uuid.uuid4().hex
@@ -77,6 +107,18 @@ def random_alphanumeric(length=5, upper_case=False):
             string.ascii_lowercase + string.digits) for _ in range(length))
 
 
+@functools.lru_cache(maxsize=None)
+def _load_template(template_file):
+    """Load and compile a Jinja2 template, caching the result by path
+
+    Templates are immutable for the lifetime of a test run, so there is no
+    point in re-reading and re-compiling them every time a resource is
+    created.
+    """
+    with open(template_file) as f:
+        return jinja2.Template(f.read())
+
+
 def get_json_object_from_template(template_name, **template_args):
     """Load template from template file
 
@@ -87,15 +129,9 @@ def get_json_object_from_template(template_name, **template_args):
     :param template_args: dictionary of template argument values for the given
                           Jinja2 template
     """
-    # get the current path relative to the ./templates/ directory
-    my_path = os.path.dirname(os.path.realpath(__file__))
-    # NOTE: the templates directory must be at the same level as
-    # utilities.py, and all the templates must have the '.yaml.j2' extension
-    templates_path = os.path.join(my_path, 'templates')
-    template_file = f'{templates_path}/{template_name}.json.j2'
+    template_file = f'{TEMPLATES_PATH}/{template_name}.json.j2'
     # now load the template
-    with open(template_file) as tempfile:
-        template = jinja2.Template(tempfile.read())
+    template = _load_template(template_file)
     template.globals['random_name'] = random_name
     template.globals['random_alphanumeric'] = random_alphanumeric
     # now render the template
@@ -105,17 +141,25 @@ def get_json_object_from_template(template_name, **template_args):
 
 def poll_for_resource_ready(request, admin_session, endpoint,
                             expected_code=200):
-    ready = polling2.poll(
-        lambda: admin_session.get(endpoint).status_code == expected_code,
-        step=5,
-        timeout=request.config.getoption('--wait-timeout'))
-    assert ready, 'Timed out while waiting for %s to yield %s' % (
-        endpoint, expected_code)
+    """Poll the endpoint until it yields the expected status code
+
+    Returns the matching response so callers don't need to fetch the
+    resource again.
+    """
+    try:
+        return polling2.poll(
+            lambda: admin_session.get(endpoint),
+            check_success=lambda resp: resp.status_code == expected_code,
+            step=5,
+            timeout=request.config.getoption('--wait-timeout'))
+    except polling2.TimeoutException:
+        errmsg = 'Timed out while waiting for %s to yield %s' % (
+            endpoint, expected_code)
+        raise AssertionError(errmsg)
 
 
 def get_latest_resource_version(request, admin_session, lookup_endpoint):
-    poll_for_resource_ready(request, admin_session, lookup_endpoint)
-    resp = admin_session.get(lookup_endpoint)
+    resp = poll_for_resource_ready(request, admin_session, lookup_endpoint)
     assert resp.status_code == 200, 'Failed to lookup resource: %s' % (
         resp.content)
     return resp.json()['metadata']['resourceVersion']
@@ -138,7 +182,8 @@ def poll_for_update_resource(request, admin_session, update_endpoint,
         if use_yaml:
             resp = admin_session.put(update_endpoint,
                                      data=yaml.dump(
-                                         request_json, sort_keys=False),
+                                         request_json, Dumper=YAMLDumper,
+                                         sort_keys=False),
                                      headers={
                                          'Content-Type': 'application/yaml'})
         else:
@@ -286,9 +331,6 @@ def stop_vm(request, admin_session, harvester_api_endpoints,
     assert resp.status_code == 202, 'Failed to stop VM instance %s' % (
         vm_name)
 
-    # give it some time for the VM instance to stop
-    time.sleep(120)
-
     def _check_vm_instance_stopped():
         resp = admin_session.get(
             harvester_api_endpoints.get_vm_instance % (
@@ -297,9 +339,12 @@ def stop_vm(request, admin_session, harvester_api_endpoints,
             return True
         return False
 
+    # the VM instance only goes away once it has stopped, so there is no
+    # need to wait before polling
     success = polling2.poll(
         _check_vm_instance_stopped,
-        step=5,
+        step=1,
+        step_function=step_backoff,
         timeout=request.config.getoption('--wait-timeout'))
     assert success, 'Failed to stop VM: %s' % (
         vm_name)
@@ -307,9 +352,6 @@ def stop_vm(request, admin_session, harvester_api_endpoints,
 
 def assert_vm_restarted(admin_session, harvester_api_endpoints,
                         previous_uid, vm_name, wait_timeout):
-    # give it some time for the VM instance to restart
-    time.sleep(180)
-
     def _check_vm_instance_restarted():
         resp = admin_session.get(
             harvester_api_endpoints.get_vm_instance % (vm_name))
@@ -322,9 +364,12 @@ def assert_vm_restarted(admin_session, harvester_api_endpoints,
                 return True
         return False
 
+    # the old VM instance keeps its uid until it is replaced, so there is
+    # no need to wait before polling
     success = polling2.poll(
         _check_vm_instance_restarted,
-        step=5,
+        step=1,
+        step_function=step_backoff,
         timeout=wait_timeout)
     assert success, 'Failed to restart VM %s' % (vm_name)
 
@@ -344,15 +389,21 @@ def delete_image_by_name(request, admin_session,
         # image doesn't exist so nothing to be done
         return
 
+    delete_sent = False
+
     def _wait_for_image_to_be_deleted():
-        # retry delete
+        nonlocal delete_sent
+        # polling2 calls this right away, so only look for the image once a
+        # full step has passed since the last delete
+        if delete_sent:
+            resp = admin_session.get(harvester_api_endpoints.get_image %
+                                     (image_name))
+            if resp.status_code == 404:
+                return True
+        # (retry) delete
         admin_session.delete(harvester_api_endpoints.delete_image %
                              (image_name))
-        time.sleep(15)
-        resp = admin_session.get(harvester_api_endpoints.get_image %
-                                 (image_name))
-        if resp.status_code == 404:
-            return True
+        delete_sent = True
         return False
 
     try:
@@ -545,8 +596,42 @@ def create_vm(request, admin_session, image, harvester_api_endpoints,
     return vm_resp_json
 
 
-def delete_vm(request, admin_session, harvester_api_endpoints, vm_json,
-              remove_all_disks=True):
+def _run_concurrently(tasks):
+    """Run the given callables concurrently and wait for all of them
+
+    At most MAX_CONCURRENT_REQUESTS tasks run at a time. Every task is run
+    to completion even if another one fails, so that no failure goes
+    unreported. A single failure is re-raised as is, several are reported
+    together in one AssertionError.
+    """
+    if not tasks:
+        return
+    with ThreadPoolExecutor(
+            max_workers=min(len(tasks), MAX_CONCURRENT_REQUESTS)) as pool:
+        futures = [pool.submit(task) for task in tasks]
+    errors = [future.exception() for future in futures
+              if future.exception() is not None]
+    if len(errors) == 1:
+        raise errors[0]
+    if errors:
+        raise AssertionError('%d concurrent tasks failed:\n%s' % (
+            len(errors), '\n'.join(repr(error) for error in errors)))
+
+
+def get_vm_volume_names(vm_json):
+    """Return the PVC claim names of the volumes attached to the VM"""
+    volumes = vm_json['spec']['template']['spec']['volumes']
+    return [volume['persistentVolumeClaim']['claimName']
+            for volume in volumes if 'persistentVolumeClaim' in volume]
+
+
+def _delete_vm_tasks(request, admin_session, harvester_api_endpoints, vm_json,
+                     remove_all_disks):
+    """Delete the VM and return the tasks that wait for its cleanup
+
+    Each task makes one request at a time, so the tasks of several VMs can
+    share one bounded pool instead of every VM spawning its own.
+    """
     resp = admin_session.delete(harvester_api_endpoints.delete_vm % (
         vm_json['metadata']['name']))
     assert resp.status_code in [200, 201], 'Failed to delete VM %s: %s' % (
@@ -559,21 +644,45 @@ def delete_vm(request, admin_session, harvester_api_endpoints, vm_json,
             return True
         return False
 
-    success = polling2.poll(
-        _check_vm_deleted,
-        step=5,
-        timeout=request.config.getoption('--wait-timeout'))
-    assert success, 'Timed out while waiting for VM to be terminated.'
+    def _wait_for_vm_deleted():
+        success = polling2.poll(
+            _check_vm_deleted,
+            step=1,
+            step_function=step_backoff,
+            timeout=request.config.getoption('--wait-timeout'))
+        assert success, 'Timed out while waiting for VM to be terminated.'
+
+    tasks = [_wait_for_vm_deleted]
     if remove_all_disks:
-        # NOTE: for PVC, we must explicitly delete the volumes after the
-        # VM is deleted
-        volumes = vm_json['spec']['template']['spec']['volumes']
-        for volume in volumes:
-            if 'persistentVolumeClaim' in volume:
-                delete_volume_by_name(
-                    request, admin_session, harvester_api_endpoints,
-                    volume['persistentVolumeClaim']['claimName'],
-                    owned_by=vm_json['metadata']['name'])
+        # NOTE: PVCs are not removed along with the VM so we must delete
+        # them explicitly. The only thing ordering that after the VM removal
+        # is delete_volume_by_name() waiting for the VM to be dropped from
+        # the harvesterhci.io/owned-by annotation, so the volume deletion
+        # runs alongside the wait for the VM to go away.
+        tasks.extend(
+            functools.partial(delete_volume_by_name, request, admin_session,
+                              harvester_api_endpoints, volume_name,
+                              owned_by=vm_json['metadata']['name'])
+            for volume_name in get_vm_volume_names(vm_json))
+    return tasks
+
+
+def delete_vm(request, admin_session, harvester_api_endpoints, vm_json,
+              remove_all_disks=True):
+    _run_concurrently(_delete_vm_tasks(request, admin_session,
+                                       harvester_api_endpoints, vm_json,
+                                       remove_all_disks))
+
+
+def delete_vms(request, admin_session, harvester_api_endpoints, vms,
+               remove_all_disks=True):
+    """Delete the given VMs concurrently and wait for all of them to go"""
+    tasks = []
+    for vm_json in vms:
+        tasks.extend(_delete_vm_tasks(request, admin_session,
+                                      harvester_api_endpoints, vm_json,
+                                      remove_all_disks))
+    _run_concurrently(tasks)
 
 
 def delete_volume(request, admin_session, harvester_api_endpoints,
@@ -582,6 +691,21 @@ def delete_volume(request, admin_session, harvester_api_endpoints,
                           volume_json['metadata']['name'])
 
 
+def delete_volumes_by_name(request, admin_session, harvester_api_endpoints,
+                           volume_names, owned_by=None):
+    """Delete the given volumes concurrently and wait for all of them to go
+
+    Each volume deletion is polled independently, so waiting on them one
+    after another makes the cleanup time grow linearly with the number of
+    disks.
+    """
+    _run_concurrently([
+        functools.partial(delete_volume_by_name, request, admin_session,
+                          harvester_api_endpoints, volume_name,
+                          owned_by=owned_by)
+        for volume_name in volume_names])
+
+
 def delete_volume_by_name(request, admin_session, harvester_api_endpoints,
                           volume_name, owned_by=None):
     # see if the volume exist first
@@ -677,11 +801,13 @@ def _lookup_node_ip(admin_session, harvester_api_endpoints, node_name):
     assert resp.status_code == 200, 'Failed to lookup host %s: %s' % (
         node_name, resp.content)
     node_json = resp.json()
+    # keep the first address of each type, e.g. IPv4 on dual-stack nodes
+    addresses = {}
     for address in node_json['status']['addresses']:
-        if address['type'] == 'InternalIP':
-            return address['address']
-    assert False, 'Failed to lookup host IP: %s' % (
+        addresses.setdefault(address['type'], address['address'])
+    assert 'InternalIP' in addresses, 'Failed to lookup host IP: %s' % (
         node_json['status']['addresses'])
+    return addresses['InternalIP']
 
 
 def power_off_node(request, admin_session, harvester_api_endpoints, node_name,
@@ -800,10 +926,8 @@ def poweroff_host_maintenance_mode(request, admin_session,
     enable_maintenance_mode(request, admin_session,
                             harvester_api_endpoints, host_poweroff)
     node_name = host_poweroff['id']
-    poll_for_resource_ready(request, admin_session,
-                            harvester_api_endpoints.get_node % (node_name))
-    resp = admin_session.get(
-        harvester_api_endpoints.get_node % (node_name))
+    resp = poll_for_resource_ready(
+        request, admin_session, harvester_api_endpoints.get_node % (node_name))
     resp.status_code == 200, 'Failed to get host: %s' % (resp.content)
     ret_data = resp.json()
     assert ret_data["spec"]["unschedulable"]
@@ -874,15 +998,9 @@ def disable_maintenance_mode(request, admin_session, harvester_api_endpoints,
 
 
 def create_tf_from_template(request, template_name, **template_args):
-    # get the current path relative to the ./templates/ directory
-    my_path = os.path.dirname(os.path.realpath(__file__))
-    # NOTE: the templates directory must be at the same level as
-    # utilities.py, and all the templates must have the '.yaml.j2' extension
-    templates_path = os.path.join(my_path, 'templates')
-    template_file = f'{templates_path}/{template_name}.tf.j2'
+    template_file = f'{TEMPLATES_PATH}/{template_name}.tf.j2'
     # now load the template
-    with open(template_file) as tempfile:
-        template = jinja2.Template(tempfile.read())
+    template = _load_template(template_file)
     # now render the template
 #    template.globals['random_name'] = random_name
     rendered = template.render(template_args)
@@ -894,13 +1012,8 @@ def create_tf_from_template(request, template_name, **template_args):
 
 def create_kubeconfig_from_template(request, template_name, **template_args):
     # Create/Update kubeconfig
-    my_path = os.path.dirname(os.path.realpath(__file__))
-    # NOTE: the templates directory must be at the same level as
-    # utilities.py, and all the templates must have the '.yaml.j2' extension
-    templates_path = os.path.join(my_path, 'templates')
-    template_file = f'{templates_path}/{template_name}.j2'
-    with open(template_file) as tempfile:
-        template = jinja2.Template(tempfile.read())
+    template_file = f'{TEMPLATES_PATH}/{template_name}.j2'
+    template = _load_template(template_file)
     # now render the template
     rendered = template.render(template_args)
     terraform_path = _get_node_script_path(
@@ -942,9 +1055,11 @@ def create_image_terraform(request, admin_session, harvester_api_endpoints,
             result.returncode, result.stderr, result.stdout))
     # wait for the image to get ready
     time.sleep(50)
+    image_json = None
 
     def _wait_for_image_become_active():
         # we want the update response to return back to the caller
+        nonlocal image_json
 
         resp = admin_session.get(harvester_api_endpoints.get_image % (
             name))
@@ -963,10 +1078,6 @@ def create_image_terraform(request, admin_session, harvester_api_endpoints,
         step=5,
         timeout=request.config.getoption('--wait-timeout'))
     assert success, 'Timed out while waiting for image to be active.'
-
-    resp = admin_session.get(harvester_api_endpoints.get_image % (
-        name))
-    image_json = resp.json()
     return image_json
 
 
@@ -1096,10 +1207,8 @@ def create_network_terraform(request, admin_session, harvester_api_endpoints,
         'Failed to run terraform : rc: %s, stdout: %s, stderr: %s' % (
             result.returncode, result.stderr, result.stdout))
 
-    poll_for_resource_ready(request, admin_session,
-                            harvester_api_endpoints.get_network % (name))
-    resp = admin_session.get(harvester_api_endpoints.get_network % (
-        name))
+    resp = poll_for_resource_ready(
+        request, admin_session, harvester_api_endpoints.get_network % (name))
     assert resp.status_code == 200, 'Failed to get Network %s: %s' % (
         name, resp.content)
 
@@ -1132,9 +1241,8 @@ def create_clusternetworks_terraform(request, admin_session,
         'Failed to run terraform : rc: %s, stdout: %s, stderr: %s' % (
             result.returncode, result.stderr, result.stdout))
 
-    poll_for_resource_ready(request, admin_session,
-                            harvester_api_endpoints.get_vlan)
-    resp = admin_session.get(harvester_api_endpoints.get_vlan)
+    resp = poll_for_resource_ready(request, admin_session,
+                                   harvester_api_endpoints.get_vlan)
     assert resp.status_code == 200, 'Failed to get vlan: %s' % (resp.content)
     network_data = resp.json()
     return network_data
@@ -1205,7 +1313,7 @@ def create_image_upload(request, admin_session, harvester_api_endpoints,
         with requests.get(url, stream=True) as r:
             r.raise_for_status()
             with open(image_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
                     f.write(chunk)
         # create an image for upload
         image_json = create_image(request, admin_session,
@@ -1216,13 +1324,13 @@ def create_image_upload(request, admin_session, harvester_api_endpoints,
         # TODO(gyee): need to check with Harvester team to see if the API
         # supports streaming
         image_size = os.stat(image_path).st_size
-        files = {'chunk': open(image_path, 'rb')}
         params = {'action': 'upload',
                   'size': image_size}
-        resp = admin_session.post(
-            harvester_api_endpoints.upload_image % (image_name),
-            files=files,
-            params=params)
+        with open(image_path, 'rb') as f:
+            resp = admin_session.post(
+                harvester_api_endpoints.upload_image % (image_name),
+                files={'chunk': f},
+                params=params)
         assert resp.status_code in [200, 201], (
             'Failed to upload image %s: %s: %s' % (
                 image_name, resp.status_code, resp.content))
@@ -1449,6 +1557,13 @@ def wait_for_ssh_client(ip, timeout, keypair=None):
     client.set_missing_host_key_policy(AutoAddPolicy)
 
     def _wait_for_connect():
+        # probe the SSH port first as it is much cheaper than a failed
+        # SSH handshake while the VM is still booting
+        try:
+            socket.create_connection((ip, 22), timeout=1).close()
+        except OSError as e:
+            print('SSH port on %s is not open yet: %s' % (ip, e))
+            return False
         try:
             # NOTE: for the default openSUSE Leap image, the root user
             # password is 'linux'
@@ -1463,9 +1578,12 @@ def wait_for_ssh_client(ip, timeout, keypair=None):
             return False
         return True
 
+    # the VM is usually still booting on the first attempts, so retry
+    # quickly and back off towards the usual 5 seconds
     ready = polling2.poll(
         _wait_for_connect,
-        step=5,
+        step=1,
+        step_function=step_backoff,
         timeout=timeout)
     assert ready, 'Timed out while waiting for SSH server to be ready'
     return client
@@ -1479,11 +1597,11 @@ def get_vm_ip_address(admin_session, harvester_api_endpoints, vm, timeout,
         nonlocal vm_instance_json
         vm_instance_json = lookup_vm_instance(
             admin_session, harvester_api_endpoints, vm)
-        for interface in vm_instance_json['status']['interfaces']:
-            # NOTE: by default, the second NIC name is 'nic-1'
-            if (interface['name'] == nic_name and
-                    'ipAddress' in interface):
-                return interface['ipAddress']
+        # NOTE: by default, the second NIC name is 'nic-1'
+        ips = {interface['name']: interface.get('ipAddress')
+               for interface in vm_instance_json['status'].get(
+                   'interfaces', [])}
+        return ips.get(nic_name)
 
     try:
         ip = polling2.poll(_wait_for_ip, step=5, timeout=timeout)